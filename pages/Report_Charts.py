@@ -1,3 +1,4 @@
+import os
 import re
 import sys
 import json
@@ -34,14 +35,22 @@ def list_report_charts():
         return []
 
     charts = []
-    for chart_path in CHARTS_DIR.glob("*.html"):
-        match = CHART_FILENAME_PATTERN.match(chart_path.stem)
+    # scandir returns names and file types from the directory read itself, no Path object or extra stat per entry
+    with os.scandir(CHARTS_DIR) as entries:
+        chart_entries = [
+            entry for entry in entries
+            if entry.name.endswith(".html") and entry.is_file()
+        ]
+
+    for entry in chart_entries:
+        stem = entry.name[:-len(".html")]
+        match = CHART_FILENAME_PATTERN.match(stem)
         if match:
             ticker = match.group("ticker")
             date = match.group("date")
             score = match.group("score")
         else:
-            ticker = chart_path.stem
+            ticker = stem
             date = "Unknown date"
             score = "N/A"
 
@@ -52,7 +61,7 @@ def list_report_charts():
                 "date": date,
                 "score": score,
                 "label": label,
-                "path": chart_path,
+                "path": Path(entry.path),
             }
         )
 
@@ -1,11 +1,14 @@
 # Add these imports at the top of your file
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import pandas as pd
 from io import StringIO
 from datetime import datetime
 from serpapi import GoogleSearch
 import yfinance as yf
+import numpy as np
 import streamlit as st
 
 HEADERS = {
@@ -16,6 +19,15 @@ HEADERS = {
     )
 }
 
+# one pooled session for all ticker-list downloads, so repeated calls reuse the HTTPS connection
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+))
+
 def get_sp500_tickers():
     """
     Fetch S&P 500 tickers from Wikipedia with a proper User-Agent header,
@@ -23,7 +35,7 @@ def get_sp500_tickers():
     """
     url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
     
-    resp = requests.get(url, headers=HEADERS)
+    resp = _SESSION.get(url)
     resp.raise_for_status()
 
     tables = pd.read_html(resp.text)
@@ -35,7 +47,7 @@ def get_sp500_tickers():
 def get_dow_tickers():
     """Return list of Dow Jones Industrial Average tickers."""
     url = "https://en.wikipedia.org/wiki/Dow_Jones_Industrial_Average"
-    resp = requests.get(url, headers=HEADERS)
+    resp = _SESSION.get(url)
     resp.raise_for_status()
 
     tables = pd.read_html(resp.text)
@@ -66,7 +78,7 @@ def get_dow_tickers():
 def get_nasdaq_tickers():
     """Return list of NASDAQ-listed tickers."""
     url = "https://www.nasdaqtrader.com/dynamic/symdir/nasdaqlisted.txt"
-    resp = requests.get(url, headers=HEADERS)
+    resp = _SESSION.get(url)
     resp.raise_for_status()
 
     # Pipe-separated text file
@@ -123,9 +135,10 @@ def estimate_future_eps_df(current_eps, growth_rate, years=5, start_year=None):
     """
     if start_year is None:
         start_year = datetime.now().year + 1  # Next year as the starting year
+    n = np.arange(1, years + 1)
     data = {
-        "Year": [start_year + n for n in range(years)],
-        "Estimated EPS": [current_eps * (1 + growth_rate) ** (n + 1) for n in range(years)]
+        "Year": start_year + n - 1,
+        "Estimated EPS": current_eps * (1 + growth_rate) ** n
     }
     return pd.DataFrame(data)
 
@@ -148,33 +161,22 @@ def estimate_future_prices(future_eps_df, pe_ratio, discount_rate, margin_of_saf
     Returns:
         pd.DataFrame: DataFrame with columns 'Year', 'Estimated EPS', 'Future Price', 'Discounted Price'.
     """
-    results = []
     current_year = datetime.now().year
-    
-    # Add current year first
-    current_present_value = current_price * (1 - margin_of_safety)  # No discount for current year
-    
-    results.append({
-        "Year": current_year,
-        "Estimated EPS": current_eps,
-        "Future Price": current_price,
-        "Discounted Price": current_present_value
-    })
+    eps = future_eps_df['Estimated EPS'].to_numpy(dtype=float)
+    n = np.arange(1, len(eps) + 1)  # years into the future
 
-    # Add future years
-    for i, row in future_eps_df.iterrows():
-        year = row['Year']
-        eps = row['Estimated EPS']
-        n = i + 1  # years into the future
-        future_price = eps * pe_ratio
-        present_value = future_price / ((1 + discount_rate) ** n) * (1 - margin_of_safety)
-        results.append({
-            "Year": year,
-            "Estimated EPS": eps,
-            "Future Price": future_price,
-            "Discounted Price": present_value
-        })
-    return pd.DataFrame(results)
+    # discount factors for every projected year in one shot
+    discount_factors = (1 + discount_rate) ** n
+    future_prices = eps * pe_ratio
+    present_values = future_prices / discount_factors * (1 - margin_of_safety)
+
+    # current year goes first, with no discount applied
+    return pd.DataFrame({
+        "Year": np.concatenate(([current_year], future_eps_df['Year'].to_numpy())),
+        "Estimated EPS": np.concatenate(([current_eps], eps)),
+        "Future Price": np.concatenate(([current_price], future_prices)),
+        "Discounted Price": np.concatenate(([current_price * (1 - margin_of_safety)], present_values))
+    })
 
 def calculate_returns(realistic_prices_df, current_price):
     """
@@ -205,6 +207,19 @@ def calculate_returns(realistic_prices_df, current_price):
     total_return = (prices[-1] - prices[0]) / prices[0] * 100
     return df, total_return
 
+@st.cache_data(ttl=3600)  # Cache for 1 hour
+def get_risk_free_rate():
+    """Returns the current 10-year Treasury yield as a decimal."""
+    treasury = yf.Ticker("^TNX")  # Symbol for 10-year Treasury yield
+    current_yield = treasury.info.get('regularMarketPrice', 4.0)
+    return current_yield / 100  # Convert percentage to decimal
+
+@st.cache_data(ttl=3600)  # Cache for 1 hour
+def get_market_average_return():
+    """Returns the S&P 500 annualized return over the last 10 years."""
+    hist = yf.Ticker("^GSPC").history(period="10y")
+    return (hist['Close'].iloc[-1] / hist['Close'].iloc[0]) ** (1/10) - 1
+
 def calculate_discount_rate(ticker):
     """
     Automatically calculates an appropriate discount rate for a company based on:
@@ -215,17 +230,9 @@ def calculate_discount_rate(ticker):
     """
     info = yf.Ticker(ticker).info
     
-    # Base components
-    # Get the 10-year Treasury yield
-    treasury = yf.Ticker("^TNX")  # Symbol for 10-year Treasury yield
-    current_yield = treasury.info.get('regularMarketPrice', 4.0)
-    risk_free_rate = current_yield / 100  # Convert percentage to decimal
-
-    # Get S&P 500 data
-    sp500 = yf.Ticker("^GSPC")
-    # Calculate 10-year average return
-    hist = sp500.history(period="10y")
-    avg_return = (hist['Close'].iloc[-1] / hist['Close'].iloc[0]) ** (1/10) - 1
+    # Base components (shared by every ticker, so they are cached)
+    risk_free_rate = get_risk_free_rate()
+    avg_return = get_market_average_return()
     # Calculate market risk premium
     mrp = avg_return - risk_free_rate
     # Ensure reasonable bounds (3% to 8%)
@@ -306,17 +313,15 @@ def get_financial_metrics(ticker):
     # Net income growth
     net_income = income_stmt.loc['Net Income'].dropna()
     
-    # Profit margins (using most recent year)
-    # Calculate profit margins safely
-    def safe_division(numerator, denominator):
-        """Safely calculate division, handling zero and negative values."""
-        if denominator == 0:
-            return float('inf') if numerator > 0 else float('-inf') if numerator < 0 else 0
-        return numerator / denominator
-    
-    # Calculate profit margins for each year
+    # Profit margins for each year, computed in a single vectorized pass.
+    # A zero revenue yields +/-inf by the sign of net income (shown as N/A), or 0 when both are zero.
+    ni = net_income.to_numpy(dtype=float)
+    rev = revenue.to_numpy(dtype=float)
+    n = min(len(ni), len(rev))
+    ni, rev = ni[:n], rev[:n]
+    zero_revenue_margin = np.where(ni == 0, 0.0, np.copysign(np.inf, ni))
     profit_margins = pd.Series(
-        [safe_division(ni, rev) * 100 for ni, rev in zip(net_income, revenue)],
+        np.divide(ni, rev, out=zero_revenue_margin, where=(rev != 0)) * 100,
         index=revenue.index
     )
     
@@ -328,16 +333,16 @@ def get_financial_metrics(ticker):
     free_cash_flow = cash_flow.loc['Free Cash Flow'].dropna()
     
     # Calculate shares outstanding (Issued - Treasury)
-    shares = stock.get_shares_full(start=pd.to_datetime(total_assets.index).min().strftime("%Y-%m-%d")).astype(float)
+    report_dates = pd.to_datetime(total_assets.index)  # converted once, used for the start date and the reindex
+    shares = stock.get_shares_full(start=report_dates.min().strftime("%Y-%m-%d")).astype(float)
     shares.index = shares.index.tz_convert(None)
     shares_daily = (shares
-                    .groupby(shares.index.date)          # `.date` ignores the time part
+                    .groupby(shares.index.normalize())   # `.normalize()` ignores the time part and stays a DatetimeIndex
                     .max()                            # or .mean() / .last()
                     .rename_axis('Date')
                     .to_frame('Diluted')              # call the column what it is
                     )
-    shares_daily.index = pd.to_datetime(shares_daily.index)
-    shares_outstanding = shares_daily['Diluted'].reindex(pd.to_datetime(total_assets.index), method="nearest")
+    shares_outstanding = shares_daily['Diluted'].reindex(report_dates, method="nearest")
     
     # Calculate YoY changes
     def calculate_yoy_change(series):
@@ -367,16 +372,16 @@ def get_financial_metrics(ticker):
     
     actual_df = pd.DataFrame(actual_data)
     
-    # Format actual values
-    actual_df['Revenue'] = actual_df['Revenue'].apply(lambda x: f"${x:,.0f}" if pd.notnull(x) else "N/A")
-    actual_df['Net Income'] = actual_df['Net Income'].apply(lambda x: f"${x:,.0f}" if pd.notnull(x) else "N/A")
-    actual_df['Profit Margin (%)'] = actual_df['Profit Margin (%)'].apply(
-        lambda x: f"{x:.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
-    )
-    actual_df['Total Assets'] = actual_df['Total Assets'].apply(lambda x: f"${x:,.0f}" if pd.notnull(x) else "N/A")
-    actual_df['Total Liabilities'] = actual_df['Total Liabilities'].apply(lambda x: f"${x:,.0f}" if pd.notnull(x) else "N/A")
-    actual_df['Free Cash Flow'] = actual_df['Free Cash Flow'].apply(lambda x: f"${x:,.0f}" if pd.notnull(x) else "N/A")
-    actual_df['Shares Outstanding'] = actual_df['Shares Outstanding'].apply(lambda x: f"{x:,.0f}" if pd.notnull(x) else "N/A")
+    # Format actual values (list comprehensions over the raw arrays skip the per-cell Series.apply overhead)
+    for col in ['Revenue', 'Net Income', 'Total Assets', 'Total Liabilities', 'Free Cash Flow']:
+        actual_df[col] = [f"${x:,.0f}" if pd.notnull(x) else "N/A" for x in actual_df[col].to_numpy()]
+    actual_df['Profit Margin (%)'] = [
+        f"{x:.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
+        for x in actual_df['Profit Margin (%)'].to_numpy()
+    ]
+    actual_df['Shares Outstanding'] = [
+        f"{x:,.0f}" if pd.notnull(x) else "N/A" for x in actual_df['Shares Outstanding'].to_numpy()
+    ]
     
     # Create DataFrame with percentage changes
     change_data = {
@@ -394,13 +399,15 @@ def get_financial_metrics(ticker):
     # Format percentage changes
     for col in change_df.columns:
         if 'Change' in col:
-            change_df[col] = change_df[col].apply(
-                lambda x: f"{x:+.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
-            )
+            change_df[col] = [
+                f"{x:+.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
+                for x in change_df[col].to_numpy()
+            ]
         elif col == 'Profit Margin (%)':
-            change_df[col] = change_df[col].apply(
-                lambda x: f"{x:.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
-            )
+            change_df[col] = [
+                f"{x:.2f}%" if pd.notnull(x) and abs(x) != float('inf') else "N/A"
+                for x in change_df[col].to_numpy()
+            ]
     
     return actual_df, change_df
 
@@ -1,11 +1,15 @@
 import yfinance as yf
 import pandas as pd
 import os
+import time
 import logging
-from datetime import datetime, timedelta
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# fast codec for the cache files: cheaper to write than the default and still much smaller than uncompressed
+PARQUET_WRITE_OPTIONS = {'engine': 'pyarrow', 'compression': 'zstd', 'compression_level': 1}
+
 class DataEngine:
     def __init__(self, config: dict):
         self.cache_dir = config.get('cache_dir', '.cache/historical_data')
@@ -16,17 +20,20 @@ class DataEngine:
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
 
-    def fetch_historical_data(self, ticker: str, force_refresh: bool = False) -> pd.DataFrame:
+    def fetch_historical_data(self, ticker: str, force_refresh: bool = False,
+                              columns: Optional[list] = None) -> pd.DataFrame:
         """
         Fetches historical data (Open, High, Low, Close, Volume). 
         First checks the local cache.
+        If columns is given, only those columns are returned and a cache hit reads only them from disk.
         """
         cache_path = os.path.join(self.cache_dir, f"{ticker}.parquet")
         
         # Checking whether the information exists and is valid
-        if not force_refresh and self._is_cache_valid(cache_path):
+        if not force_refresh and self._get_valid_cache_mtime(cache_path) is not None:
             try:
-                df = pd.read_parquet(cache_path)
+                # parquet is columnar, so a partial read skips the other column chunks entirely
+                df = pd.read_parquet(cache_path, engine='pyarrow', columns=columns)
                 if not df.empty:
                     return df
             except Exception as e:
@@ -41,32 +48,66 @@ class DataEngine:
                 period=self.default_period, 
                 interval=self.default_interval,
                 progress=False,
-                auto_adjust=True 
+                auto_adjust=True,
+                multi_level_index=False  # flat OHLCV columns for a single ticker, nothing to flatten afterwards
             )
 
             if df.empty:
                 logger.warning(f"No data returned for {ticker}")
                 return pd.DataFrame()
 
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            df = df[['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+            df = self._clean_ohlcv(df)
 
             # Saving to the cache.
-            df.to_parquet(cache_path)
+            df.to_parquet(cache_path, **PARQUET_WRITE_OPTIONS)
             
-            return df
+            return df if columns is None else df[columns]
 
         except Exception as e:
             logger.error(f"Error fetching {ticker} from Yahoo Finance: {e}")
             return pd.DataFrame()
 
-    def _is_cache_valid(self, path: str) -> bool:
-        if not os.path.exists(path):
-            return False
-        
-        file_age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(path))
-        return file_age < timedelta(hours=self.cache_expiry_hours)
+    def _get_valid_cache_mtime(self, path: str) -> Optional[float]:
+        """
+        Returns the mtime of the cache file if it exists and has not expired, otherwise None.
+        A single stat call covers both the existence and the age check.
+        """
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if time.time() - mtime < self.cache_expiry_hours * 3600:
+            return mtime
+        return None
+
+    @staticmethod
+    def _clean_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+        # de-duplicate, select and drop gaps in one pass
+        return df.loc[:, ~df.columns.duplicated(keep='first')][['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+
+    def stale_tickers(self, tickers: list) -> list:
+        """
+        Returns the tickers that have no valid cache file, i.e. the ones fetch_historical_data would download.
+        """
+        return [
+            ticker for ticker in tickers
+            if self._get_valid_cache_mtime(os.path.join(self.cache_dir, f"{ticker}.parquet")) is None
+        ]
+
+    def prefetch(self, tickers: list, batch_size: int = 50):
+        """
+        Downloads every ticker without a valid cache file in multi-ticker batches (see bulk_fetch),
+        so the following fetch_historical_data calls are served from the cache instead of one request per ticker.
+        """
+        stale = self.stale_tickers(tickers)
+        for i in range(0, len(stale), batch_size):
+            batch = stale[i : i + batch_size]
+            try:
+                self.bulk_fetch(batch)
+            except Exception as e:
+                # whatever is still missing gets downloaded one by one by fetch_historical_data
+                logger.warning(f"Bulk fetch failed for batch starting with {batch[0]}: {e}")
 
     def bulk_fetch(self, tickers: list):
         """
@@ -74,13 +115,14 @@ class DataEngine:
         """
         # In Yahoo Finance it's recommended to download in batches so as not to get blocked.
         logger.info(f"Bulk fetching {len(tickers)} tickers...")
-        data = yf.download(tickers, period=self.default_period, interval=self.default_interval, group_by='ticker', progress=True)
+        data = yf.download(tickers, period=self.default_period, interval=self.default_interval, group_by='ticker',
+                           auto_adjust=True, threads=True, progress=False)
         
         for ticker in tickers:
             try:
-                ticker_df = data[ticker].dropna()
+                ticker_df = self._clean_ohlcv(data[ticker])
                 if not ticker_df.empty:
                     cache_path = os.path.join(self.cache_dir, f"{ticker}.parquet")
-                    ticker_df.to_parquet(cache_path)
+                    ticker_df.to_parquet(cache_path, **PARQUET_WRITE_OPTIONS)
             except KeyError:
                 continue
\ No newline at end of file
@@ -1,11 +1,96 @@
 import numpy as np
 import pandas as pd
-from scipy.signal import argrelextrema
-from sklearn.linear_model import LinearRegression
+from functools import lru_cache
+from collections import namedtuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# windows whose selection scores differ by less than this are a tie (they usually share the same extrema,
+# so the difference is floating-point noise); the earlier window in adaptive_windows wins
+SELECTION_SCORE_TOLERANCE = 1e-12
+
+def _relative_extrema(values: np.ndarray, order: int, is_high: bool) -> np.ndarray:
+    """
+    Indices of strict local maxima (or minima) over `order` points on each side.
+    Same result as scipy's argrelextrema with its default 'clip' mode, which is what the edge padding reproduces.
+    """
+    if len(values) == 0:
+        return np.array([], dtype=np.intp)
+    padded = np.concatenate((np.full(order, values[0]), values, np.full(order, values[-1])))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * order + 1)
+    center = windows[:, order]
+    if is_high:
+        mask = (center > windows[:, :order].max(axis=1)) & (center > windows[:, order + 1:].max(axis=1))
+    else:
+        mask = (center < windows[:, :order].min(axis=1)) & (center < windows[:, order + 1:].min(axis=1))
+    return np.flatnonzero(mask)
+
+def _linear_percentile(values: np.ndarray, q: float) -> float:
+    """
+    np.percentile(values, q) with the default linear method, from the two neighbouring order statistics.
+    np.partition finds them without sorting the whole array. Expects values without NaNs.
+    """
+    position = (len(values) - 1) * (q / 100)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    partitioned = np.partition(values, (lower, upper))
+    a, b = float(partitioned[lower]), float(partitioned[upper])
+    t = position - lower
+    # same interpolation (and rounding) as numpy's _lerp
+    return a + (b - a) * t if t < 0.5 else b - (b - a) * (1 - t)
+
+@lru_cache(maxsize=64)
+def _x_axis(length: int) -> np.ndarray:
+    x_axis = np.arange(length)
+    x_axis.setflags(write=False)  # shared between calls
+    return x_axis
+
+@lru_cache(maxsize=64)
+def _trend_weights(length: int, start: float, end: float) -> np.ndarray:
+    weights = np.linspace(start, end, length)
+    weights.setflags(write=False)  # shared between calls
+    return weights
+
+# per-window detection result; only the selected window is turned into the public result dict
+WindowResult = namedtuple('WindowResult', [
+    'is_converging', 'is_breaking_out', 'is_breaking_down', 'breakout_age', 'breakout_strength',
+    'r2_high', 'r2_low', 'upper_trendline', 'lower_trendline', 'compression'
+])
+
+# shared result for windows without enough significant extrema
+_NO_PATTERN = WindowResult(False, False, False, 0, 0.0, -1, -1, None, None, 1.0)
+
+def _wls(x: np.ndarray, y: np.ndarray, w: np.ndarray = None) -> tuple:
+    """
+    Closed-form (weighted) least squares fit of y = slope * x + intercept.
+    Returns (slope, intercept, r2). Like LinearRegression.score, R2 is the unweighted fit quality.
+    """
+    x = x.astype(float)
+    if w is None:
+        x_mean = x.mean()
+        y_mean = y.mean()
+        dx = x - x_mean
+        slope = (dx * (y - y_mean)).sum() / (dx * dx).sum()
+    else:
+        sw = w.sum()
+        x_mean = (w * x).sum() / sw
+        y_mean = (w * y).sum() / sw
+        dx = x - x_mean
+        slope = (w * dx * (y - y_mean)).sum() / (w * dx * dx).sum()
+    intercept = y_mean - slope * x_mean
+
+    residuals = y - (slope * x + intercept)
+    ss_res = (residuals * residuals).sum()
+    centered = y - y.mean()
+    ss_tot = (centered * centered).sum()
+    if ss_tot == 0:
+        # same convention as sklearn for a flat target
+        r2 = 1.0 if ss_res == 0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return slope, intercept, r2
+
 class PatternDetector:
     def __init__(self, config: dict):
         self.order = config.get('extrema_order', 5)  # How many days on each side of each point for it to be considered a peak.
@@ -22,13 +107,19 @@ class PatternDetector:
         adaptive_start = adaptive_windows_config.get('start', 40)
         adaptive_end = adaptive_windows_config.get('end', 360)
         adaptive_step = adaptive_windows_config.get('step', 10)
-        self.adaptive_windows = list(range(adaptive_start, adaptive_end, adaptive_step))
+        self.adaptive_windows = tuple(range(adaptive_start, adaptive_end, adaptive_step))
         
         # Order adjustment configuration
         order_adj_config = config.get('order_adjustment', {})
         self.min_order = order_adj_config.get('min_order', 3)
         self.order_threshold = order_adj_config.get('threshold', 100)
         self.order_adjustment = order_adj_config.get('adjustment', -2)
+
+        # dynamic adjustment of the order, resolved once per window
+        self.window_orders = tuple(
+            (window, max(self.min_order, self.order if window > self.order_threshold else self.order + self.order_adjustment))
+            for window in self.adaptive_windows
+        )
         
         # Selection scoring configuration
         scoring_config = config.get('selection_scoring', {})
@@ -51,140 +142,181 @@ class PatternDetector:
             'selection_score': -1.0
         }
 
-        valid_results = []
+        # the best window so far as (result, window, score); a later window has to score strictly higher to replace it (like max())
+        selected = None
+
+        # pulling the columns out of pandas once; every window is a view into these arrays
+        high = df['High'].to_numpy(dtype=float)
+        low = df['Low'].to_numpy(dtype=float)
+        close = df['Close'].to_numpy(dtype=float)
+
+        # extrema of the full series, computed once per order and shared by all windows using it
+        full_extrema = {}
         
-        for window in self.adaptive_windows:
+        for window, current_order in self.window_orders:
             if len(df) < window: continue
+
+            if current_order not in full_extrema:
+                full_extrema[current_order] = (
+                    _relative_extrema(high, current_order, is_high=True),
+                    _relative_extrema(low, current_order, is_high=False)
+                )
+            full_high_idx, full_low_idx = full_extrema[current_order]
+            start = len(df) - window
+            high_idx = self._window_extrema(high, full_high_idx, start, current_order, is_high=True)
+            low_idx = self._window_extrema(low, full_low_idx, start, current_order, is_high=False)
+
+            # filtering only removes points, so a window that is already short of extrema can't form both lines
+            if len(high_idx) < self.min_points or len(low_idx) < self.min_points:
+                continue
             
-            df_slice = df.tail(window).copy()
-            
-            # dynamic adjustment of the order
-            current_order = max(self.min_order, self.order if window > self.order_threshold else self.order + self.order_adjustment)
-            
-            # running the detection on the specific window
-            original_order = self.order
-            self.order = current_order
-            result = self._find_pattern_in_window(df_slice)
-            self.order = original_order
+            # running the detection on the specific window (the order is passed explicitly so windows don't share state)
+            result = self._find_pattern_in_window(high[-window:], low[-window:], close[-window:], current_order, high_idx, low_idx)
             
-            if result['is_converging'] and result['is_breaking_out']:
+            if result.is_converging and result.is_breaking_out:
                 # calculating a quality score that favors high R2 (precision over time)
                 # significant bonus for windows that show geometric "cleanliness" (R2 > threshold)
-                quality_bonus = self.quality_bonus_value if result['r2_high'] > self.quality_bonus_threshold else 1.0
+                quality_bonus = self.quality_bonus_value if result.r2_high > self.quality_bonus_threshold else 1.0
                 window_weight = self.window_weight_value if window <= self.window_weight_threshold else 1.0
-                
-                result['selection_score'] = result['r2_high'] * window_weight * quality_bonus
-                result['used_window'] = window
-                valid_results.append(result)
-
-        if valid_results:
-            # selecting the window that has the most "correct" geometric structure statistically
-            best_result = max(valid_results, key=lambda x: x['selection_score'])
-            logger.info(f"Adaptive scan selected window {best_result['used_window']} (R2: {best_result['r2_high']:.2f})")
+                selection_score = result.r2_high * window_weight * quality_bonus
+
+                # keeping the window that has the most "correct" geometric structure statistically
+                if selected is None or selection_score > selected[2] + SELECTION_SCORE_TOLERANCE:
+                    selected = (result, window, selection_score)
+
+        if selected is not None:
+            result, window, selection_score = selected
+
+            # attaching the dates only to the trendlines of the selected window
+            window_index = df.index[-window:]
+            best_result = {
+                'is_converging': result.is_converging,
+                'is_breaking_out': result.is_breaking_out,
+                'is_breaking_down': result.is_breaking_down,
+                'breakout_age': result.breakout_age,
+                'breakout_strength': result.breakout_strength,
+                'r2_high': result.r2_high,
+                'r2_low': result.r2_low,
+                'trendlines': {
+                    'upper': pd.Series(result.upper_trendline, index=window_index),
+                    'lower': pd.Series(result.lower_trendline, index=window_index)
+                },
+                'compression': result.compression,
+                'selection_score': selection_score,
+                'used_window': window
+            }
+            # runs once per ticker with a pattern, inside the workers: debug only, formatted lazily
+            logger.debug("Adaptive scan selected window %d (R2: %.2f)", window, result.r2_high)
             
         return best_result
 
-    def _find_pattern_in_window(self, df: pd.DataFrame) -> dict:
+    @staticmethod
+    def _window_extrema(values: np.ndarray, full_idx: np.ndarray, start: int, order: int, is_high: bool) -> np.ndarray:
+        """
+        Returns the extrema of values[start:] (in window positions) from the extrema of the full series.
+        Points at least `order` bars into the window see the same neighbours in both, only the first
+        `order` points have fewer neighbours inside the window and are re-checked on a short slice.
+        """
+        edge_idx = _relative_extrema(values[start:start + 2 * order], order, is_high)
+        inner_idx = full_idx[full_idx >= start + order] - start
+        return np.concatenate((edge_idx[edge_idx < order], inner_idx))
+
+    def _find_pattern_in_window(self, high: np.ndarray, low: np.ndarray, prices: np.ndarray, order: int,
+                                high_idx: np.ndarray, low_idx: np.ndarray) -> WindowResult:
         """
         Analyzes whether the stock chart is in a convergence process.
+        Works on plain High/Low/Close arrays of the window and the extrema positions found in it;
+        returns a WindowResult with the trendlines as arrays.
         """
-        prices = df['Close'].values
-        x_axis = np.arange(len(prices))
+        x_axis = _x_axis(len(prices))
 
-        # 1. Finding local extrema points.
-        high_idx = argrelextrema(df['High'].values, np.greater, order=self.order)[0]
-        low_idx = argrelextrema(df['Low'].values, np.less, order=self.order)[0]
+        # 1. Filtering insignificant extrema points
+        high_idx = self._filter_significant_extrema(high_idx, high, is_high=True, order=order)
+        low_idx = self._filter_significant_extrema(low_idx, low, is_high=False, order=order)
 
-        # filtering insignificant extrema points
-        high_idx = self._filter_significant_extrema(high_idx, df['High'].values, is_high=True)
-        low_idx = self._filter_significant_extrema(low_idx, df['Low'].values, is_high=False)
+        # the prices at the extrema, gathered once and reused by the percentile filter and the regressions
+        high_values = high[high_idx]
+        low_values = low[low_idx]
 
         if len(high_idx) > self.min_points:
             # we take only the N highest points that create the trend line
             # this prevents low points in the middle from pulling the regression
-            high_values = df['High'].values[high_idx]
-            threshold = np.percentile(high_values, 30) # filtering out the 30% lowest points from the highs
-            high_idx = high_idx[high_values >= threshold]
+            # extrema are never NaN (the comparisons that find them fail on NaN)
+            threshold = _linear_percentile(high_values, 30) # filtering out the 30% lowest points from the highs
+            keep = high_values >= threshold
+            high_idx = high_idx[keep]
+            high_values = high_values[keep]
 
         if len(high_idx) < self.min_points or len(low_idx) < self.min_points:
-            return {'is_converging': False, 'is_breaking_out': False, 'r2_high': -1}
+            return _NO_PATTERN
 
         # 2. Fitting trend lines (linear regression).
 
         # Resistance line (highs)
-        weights = np.linspace(self.weight_start, self.weight_end, len(high_idx))
-        model_high = LinearRegression().fit(high_idx.reshape(-1, 1), df['High'].values[high_idx], sample_weight=weights)
-        r2_high = model_high.score(high_idx.reshape(-1, 1), df['High'].values[high_idx])
-
-        slope_high = model_high.coef_[0]
-        intercept_high = model_high.intercept_
-        upper_trendline = pd.Series(slope_high * x_axis + intercept_high, index=df.index)
+        weights = _trend_weights(len(high_idx), self.weight_start, self.weight_end)
+        slope_high, intercept_high, r2_high = _wls(high_idx, high_values, weights)
+        upper_trendline = slope_high * x_axis + intercept_high
 
         # Support line (lows).
-        model_low = LinearRegression().fit(low_idx.reshape(-1, 1), df['Low'].values[low_idx])
-        r2_low = model_low.score(low_idx.reshape(-1, 1), df['Low'].values[low_idx])
-        slope_low = model_low.coef_[0]
-        intercept_low = model_low.intercept_
-        lower_trendline = pd.Series(slope_low * x_axis + intercept_low, index=df.index)
+        slope_low, intercept_low, r2_low = _wls(low_idx, low_values)
+        lower_trendline = slope_low * x_axis + intercept_low
 
         # 3. Checking convergence and compression
         first_extrema_idx = int(min(high_idx[0], low_idx[0]))
-        dist_start = upper_trendline.iloc[first_extrema_idx] - lower_trendline.iloc[first_extrema_idx]
-        dist_end = upper_trendline.iloc[-1] - lower_trendline.iloc[-1]
+        dist_start = upper_trendline[first_extrema_idx] - lower_trendline[first_extrema_idx]
+        dist_end = upper_trendline[-1] - lower_trendline[-1]
         compression = float(dist_end / dist_start) if dist_start > 0 else 1.0
 
         is_converging = (slope_high < slope_low) and (compression < self.convergence_threshold)
 
         # 4. Breakout detection (vectorized)
         # Comparing all prices to the trend line in one go
-        is_above = (prices > upper_trendline.values)
-        consecutive_above = 0
-        for val in reversed(is_above):
-            if val:
-                consecutive_above += 1
-            else:
-                break
+        is_above = (prices > upper_trendline)
+        # the breakout age is the run of True values at the end: everything after the last close below the line
+        not_above = np.flatnonzero(~is_above)
+        consecutive_above = len(prices) if len(not_above) == 0 else len(prices) - 1 - not_above[-1]
         
         # Definition: a relevant breakout is only one that has exactly 1 or 2 days above the line
         is_breaking_out = self.breakout_min_days <= consecutive_above <= self.breakout_max_days
 
         # Detection of a breakdown
         confirm_days = min(len(prices), max(1, self.breakdown_confirm_days))
-        is_breaking_down = all(
-            prices[-offset] < lower_trendline.iloc[-offset]
-            for offset in range(1, confirm_days + 1)
-        )
+        is_breaking_down = bool((prices[-confirm_days:] < lower_trendline[-confirm_days:]).all())
 
-        return {
-            'is_converging': is_converging,
-            'is_breaking_out': is_breaking_out,
-            'is_breaking_down': is_breaking_down,
-            'breakout_age': int(consecutive_above),
-            'breakout_strength': float((prices[-1] / upper_trendline.iloc[-1]) - 1),
-            'r2_high': r2_high,
-            'r2_low': r2_low,
-            'trendlines': {'upper': upper_trendline, 'lower': lower_trendline},
-            'compression': compression
-        }
+        return WindowResult(
+            is_converging=is_converging,
+            is_breaking_out=is_breaking_out,
+            is_breaking_down=is_breaking_down,
+            breakout_age=int(consecutive_above),
+            breakout_strength=float((prices[-1] / upper_trendline[-1]) - 1),
+            r2_high=r2_high,
+            r2_low=r2_low,
+            upper_trendline=upper_trendline,
+            lower_trendline=lower_trendline,
+            compression=compression
+        )
 
-    def _filter_significant_extrema(self, indices: np.ndarray, values: np.ndarray, is_high: bool) -> np.ndarray:
+    def _filter_significant_extrema(self, indices: np.ndarray, values: np.ndarray, is_high: bool, order: int) -> np.ndarray:
         """
         Filters out insignificant extrema points and keeps only those that define the envelope.
         """
         if len(indices) <= self.min_points:
             return indices
 
-        filtered = []
-        # minimum distance between extrema points (based on the original order)
-        min_dist = self.order * 2 
+        # minimum distance between extrema points (based on the window's order)
+        min_dist = order * 2 
 
-        # sorting the points by strength (highest for highs, lowest for lows)
-        sorted_indices = sorted(indices, key=lambda idx: values[idx], reverse=is_high)
-        
-        for idx in sorted_indices:
-            # checking if the point is far enough from the points we already selected
-            if all(abs(idx - f_idx) > min_dist for f_idx in filtered):
-                filtered.append(idx)
+        # sorting the points by strength (highest for highs, lowest for lows); stable, so ties keep chronological order
+        strength = values[indices]
+        by_strength = indices[np.argsort(-strength if is_high else strength, kind='stable')]
+
+        # positions within min_dist of an already selected point are blocked
+        blocked = np.zeros(indices.max() + 1, dtype=bool)
+        selected = np.zeros(indices.max() + 1, dtype=bool)
+        for idx in by_strength.tolist():
+            if not blocked[idx]:
+                selected[idx] = True
+                blocked[max(0, idx - min_dist):idx + min_dist + 1] = True
         
-        # returning the indices in chronological order
-        return np.sort(np.array(filtered))
\ No newline at end of file
+        # returning the indices in chronological order (a mask is already ordered, no sort needed)
+        return np.flatnonzero(selected)
\ No newline at end of file
@@ -2,16 +2,23 @@ import pandas as pd
 import yfinance as yf
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor # market cap lookups are network-bound
 from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+# the SMA slope is fitted over a fixed number of recent values, so the centered x-axis is a constant
+SLOPE_POINTS = 20
+SLOPE_X_CENTERED = np.arange(SLOPE_POINTS, dtype=np.float64) - (SLOPE_POINTS - 1) / 2
+SLOPE_X_SS = float((SLOPE_X_CENTERED * SLOPE_X_CENTERED).sum())
+
 class FilterEngine:
     def __init__(self, config: dict, data_engine=None):
         self.min_market_cap = config.get('min_market_cap', 2e9)  # default 2 billion
         self.sma_period = config.get('sma_period', 150)
         self.slope_threshold = config.get('max_slope', 0.0) # negative slope is still/strong (depending on the strategy)
         self.batch_size = config.get('batch_size', 50)
+        self.market_cap_workers = config.get('market_cap_workers', 32)
         self.data_engine = data_engine  # Optional DataEngine for cache usage
         self.use_cache = data_engine is not None
 
@@ -28,22 +35,33 @@ class FilterEngine:
             # Market cap unavailable or error - skip this ticker
             return False
 
-    def _process_ticker(self, ticker: str, df: pd.DataFrame) -> bool:
+    def _recent_closes(self, ticker: str, df: pd.DataFrame) -> Optional[np.ndarray]:
         """
-        Processes a single ticker through all filter criteria.
-        Returns True if ticker passes all filters, False otherwise.
+        Returns the closing prices needed by the trend filter, or None if there is not enough history.
         """
         # Check if we have enough data (need at least sma_period + 20 days)
         if df.empty or len(df) < self.sma_period + 20:
             logger.debug(f"Insufficient data for {ticker}: {len(df)} rows")
-            return False
+            return None
+        return df['Close'].to_numpy(dtype=np.float64)[-(self.sma_period + SLOPE_POINTS - 1):]
 
-        # Check market cap
-        if not self._check_market_cap(ticker):
-            return False
+    def _filter_candidates(self, closes: dict) -> List[str]:
+        """
+        Runs the trend filter on all collected tickers at once, then checks the market cap
+        only for the tickers whose trend passed.
+        """
+        if not closes:
+            return []
+        tickers = list(closes)
+        passed_trend = self._trend_mask(np.stack([closes[t] for t in tickers]))
+        candidates = [t for t, ok in zip(tickers, passed_trend) if ok]
+        if not candidates:
+            return []
 
-        # Calculate the moving average slope (SMA Slope)
-        return self._is_trend_bullish(df)
+        # each lookup is a round-trip to Yahoo, so overlap them
+        with ThreadPoolExecutor(max_workers=min(self.market_cap_workers, len(candidates))) as executor:
+            mcap_ok = list(executor.map(self._check_market_cap, candidates))
+        return [t for t, ok in zip(candidates, mcap_ok) if ok]
 
     def apply_coarse_filters(self, tickers: List[str]) -> List[str]:
         """
@@ -55,20 +73,25 @@ class FilterEngine:
         total = len(tickers)
 
         if self.use_cache:
-            # Use cached data approach - process tickers individually using cache
+            # Use cached data approach - load every ticker's closes from the cache, then filter them together
             logger.info("Using cached data when available to minimize API calls...")
+
+            closes = {}
             for i, ticker in enumerate(tickers, 1):
                 # report progress to the log (every 100 tickers or at the end)
                 if i % 100 == 0 or i == total:
                     logger.info(f"FILTER_PROGRESS: {i}/{total}")
 
                 try:
-                    df = self.data_engine.fetch_historical_data(ticker, force_refresh=False)
-                    if self._process_ticker(ticker, df):
-                        passed_tickers.append(ticker)
+                    # the trend filter only looks at closing prices
+                    df = self.data_engine.fetch_historical_data(ticker, force_refresh=False, columns=['Close'])
+                    recent = self._recent_closes(ticker, df)
+                    if recent is not None:
+                        closes[ticker] = recent
                 except Exception as e:
                     logger.debug(f"Error processing {ticker}: {e}")
                     continue
+            passed_tickers = self._filter_candidates(closes)
         else:
             # Fallback to batch download approach (original behavior)
             logger.info("Using batch download (no cache available)...")
@@ -83,43 +106,40 @@ class FilterEngine:
                     # 1. fetch historical price data for slope calculation
                     # we fetch enough data to calculate SMA200 and the slope of it
                     data = yf.download(batch, period="300d", interval="1d", group_by='ticker', threads=True, progress=False)
+                    closes = {}
                     for ticker in batch:
                         if ticker not in data.columns.get_level_values(0):
                             continue
-                        df = data[ticker].dropna()
-                        if self._process_ticker(ticker, df):
-                            passed_tickers.append(ticker)
+                        recent = self._recent_closes(ticker, data[ticker].dropna())
+                        if recent is not None:
+                            closes[ticker] = recent
+                    passed_tickers.extend(self._filter_candidates(closes))
                 except Exception as e:
                     logger.error(f"Error processing batch starting with {batch[0]}: {e}")
 
         logger.info(f"Filtering complete. {len(passed_tickers)} tickers passed.")
         return passed_tickers
 
-    def _is_trend_bullish(self, df: pd.DataFrame) -> bool:
+    def _trend_mask(self, closes: np.ndarray) -> np.ndarray:
         """
-        Checks two accumulated conditions:
+        Vectorized trend check for many tickers at once.
+        closes holds one row per ticker with its last sma_period + 19 closing prices.
+        Checks two accumulated conditions per row:
         1. The current price is above the 150-day SMA.
         2. The slope of the SMA is 0 or positive (not decreasing).
         """
-        close = df['Close']
-        sma = close.rolling(window=self.sma_period).mean()
-        
-        # Checking that there is enough data for the calculation
-        recent_sma = sma.dropna().tail(20)
-        if len(recent_sma) < 20:
-            return False
-            
+        # only the last 20 SMA values are needed: a cumulative sum over the tail gives them without a full rolling pass
+        cs = np.zeros((closes.shape[0], closes.shape[1] + 1))
+        np.cumsum(closes, axis=1, out=cs[:, 1:])
+        recent_sma = (cs[:, self.sma_period:] - cs[:, :-self.sma_period]) / self.sma_period
+
         # 1. Checking the position: the last closing price (close) is above the last SMA
-        current_price = close.iloc[-1]
-        current_sma = sma.iloc[-1]
-        if current_price <= current_sma:
-            return False
+        above_sma = closes[:, -1] > recent_sma[:, -1]
 
         # 2. Checking the slope (Regression on SMA)
         # Normalizing the SMA so the slope is limited by the price
-        x = np.arange(len(recent_sma))
-        y = recent_sma.values / recent_sma.values[0]
-        slope, _ = np.polyfit(x, y, 1)
-        
+        y = recent_sma / recent_sma[:, :1]
+        slope = (SLOPE_X_CENTERED * (y - y.mean(axis=1, keepdims=True))).sum(axis=1) / SLOPE_X_SS
+
         # The condition: slope is positive or zero
-        return slope >= self.slope_threshold
\ No newline at end of file
+        return above_sma & (slope >= self.slope_threshold)
@@ -1,14 +1,30 @@
 import os
 import re
+import json
+import hashlib
+import time
+import asyncio
 import logging
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from serpapi import GoogleSearch
-from typing import Dict
+from typing import Dict, List, Optional
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# the sentiment tag the prompts ask the model to end with
+SENTIMENT_PATTERN = re.compile(r"FINAL_SENTIMENT:\s*(BULLISH|BEARISH|NEUTRAL)", re.IGNORECASE)
+SENTIMENT_LINE_PATTERN = re.compile(r"FINAL_SENTIMENT:.*")
+# the one-word answer of the quick screen
+QUICK_SENTIMENT_PATTERN = re.compile(r"\b(BULLISH|BEARISH|NEUTRAL)\b", re.IGNORECASE)
+DEFAULT_QUICK_PROMPT = (
+    "Ticker: {ticker}\n"
+    "Latest news:\n{news}\n\n"
+    "Based only on the news above, is a full analysis of this stock likely to end up "
+    "BULLISH, BEARISH or NEUTRAL? Answer with exactly one of these words."
+)
+
 
 class LLMAnalyzer:
     def __init__(self, config: Dict):
@@ -19,15 +35,72 @@ class LLMAnalyzer:
         self.reasoning_effort = config.get('reasoning_effort', "medium")
         self.prompts = config.get('prompts', {})
         self.system_roles = config.get('system_roles', {})
+        self.prompt_suffixes = config.get('prompt_suffixes', {})
+        self.max_concurrency = config.get('max_concurrency', 4)  # parallel requests in get_equity_reports
+        # optional cheap model that screens tickers in get_equity_reports; only non-NEUTRAL ones get the full report
+        self.quick_model = config.get('quick_model')
+        self.quick_prompt = config.get('quick_prompt') or DEFAULT_QUICK_PROMPT
+        # upper bound on generated tokens (reasoning models count their reasoning tokens here too); None = no cap
+        self.max_completion_tokens = config.get('max_completion_tokens')
+        # offline runs can go through the Batch API instead: half the price, results within 24h
+        self.use_batch_api = config.get('use_batch_api', False)
+        self.batch_poll_seconds = config.get('batch_poll_seconds', 60)
+        self.batch_max_wait_minutes = config.get('batch_max_wait_minutes', 24 * 60)
+        # news search results are reused for a while instead of hitting SerpAPI for every report
+        cache_dir = config.get('cache_dir', '.cache/llm')
+        self.news_cache_dir = os.path.join(cache_dir, 'news')
+        self.news_cache_minutes = config.get('news_cache_minutes', 60)
+        self._news_memo = {}  # ticker -> (fetch time, news)
+        # identical requests (same model, prompt and news) get the stored report instead of a new API call
+        self.response_cache_dir = os.path.join(cache_dir, 'responses')
+        self.response_cache_minutes = config.get('response_cache_minutes', 240)
+
+    @staticmethod
+    def _read_cache(path: str, max_age_seconds: float):
+        """
+        Returns (written at, payload) for a cache file younger than max_age_seconds, otherwise None.
+        """
+        try:
+            written_at = os.stat(path).st_mtime
+            if time.time() - written_at >= max_age_seconds:
+                return None
+            with open(path, 'r') as f:
+                return written_at, json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_cache(path: str, payload):
+        # written through a temp file so concurrent readers never see a partial entry
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache file {path}: {e}")
 
     def _get_latest_news(self, ticker: str) -> str:
         """
         retrieves the latest news for the ticker to provide the analyst with 'Hard Data' up to date.
+        Results are cached in memory and on disk for news_cache_minutes.
         """
         if not self.serpapi_key:
             logger.warning("No SERPAPI_KEY found, skipping news retrieval.")
             return "No recent news metadata available."
 
+        max_age = self.news_cache_minutes * 60
+        memo = self._news_memo.get(ticker)
+        if memo is not None and time.time() - memo[0] < max_age:
+            return memo[1]
+
+        cache_path = os.path.join(self.news_cache_dir, f"{ticker}.json")
+        cached = self._read_cache(cache_path, max_age)
+        if cached is not None and 'news' in cached[1]:
+            self._news_memo[ticker] = (cached[0], cached[1]['news'])
+            return cached[1]['news']
+
         try:
             # focused search for news and catalysts (like in USAR)
             search_query = f"{ticker} stock news catalyst press release"
@@ -50,30 +123,43 @@ class LLMAnalyzer:
                     date = item.get("date", "Recent")
                     news_items.append(f"[{date}] {title}: {snippet}")
             
-            return "\n".join(news_items) if news_items else "No recent news found."
+            news = "\n".join(news_items) if news_items else "No recent news found."
             
         except Exception as e:
             logger.error(f"Search failed for {ticker}: {e}")
             return "Error retrieving recent news."
 
-    def get_equity_report(self, ticker: str, report_type: str = "fundamental") -> Dict[str, str]:
+        # only successful searches are cached
+        self._news_memo[ticker] = (time.time(), news)
+        self._write_cache(cache_path, {'news': news})
+        return news
+
+    def _response_cache_path(self, api_params: Dict) -> str:
+        key = hashlib.sha256(json.dumps(api_params, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.response_cache_dir, f"{key}.json")
+
+    def _get_cached_report(self, cache_path: str) -> Optional[Dict[str, str]]:
+        cached = self._read_cache(cache_path, self.response_cache_minutes * 60)
+        return cached[1] if cached is not None else None
+
+    def _build_request(self, ticker: str, report_type: str) -> Optional[Dict]:
         """
-        Creates a full analysis report based on the professional prompt you defined.
+        Builds the chat completion parameters for a report, or None if there is no prompt for the report type.
         """
         prompt_template = self.prompts.get(report_type, "")
         system_role = self.system_roles.get(report_type, "You are an analyst.")
 
         if not prompt_template:
-            return {"report": "Error: Prompt not found.", "sentiment": "ERROR"}
+            return None
 
         # --- upgrade: bring the news before sending to the LLM ---
         latest_news = self._get_latest_news(ticker)
 
-        full_context_prompt = (
-            f"{prompt_template.format(ticker=ticker)}\n\n"
-            f"--- LATEST NEWS & CATALYSTS FOR {ticker} ---\n"
-            f"{latest_news}\n"
-            f"--- END OF NEWS ---"
+        # static instructions first and the ticker-specific part last, so every ticker shares the same prompt prefix
+        prompt_suffix = self.prompt_suffixes.get(report_type) or (
+            "--- LATEST NEWS & CATALYSTS FOR {ticker} ---\n"
+            "{news}\n"
+            "--- END OF NEWS ---"
         )
 
         # Detect if we're using a new generation model (GPT-5 and above)
@@ -81,11 +167,15 @@ class LLMAnalyzer:
         role = "developer" if is_new_gen else "system"
         messages = [
             {"role": role, "content": system_role},
-            {"role": "user", "content": full_context_prompt}
+            # older configs may still put {ticker} into the main prompt
+            {"role": "user", "content": prompt_template.format(ticker=ticker)},
+            {"role": "user", "content": prompt_suffix.format(ticker=ticker, news=latest_news)}
         ]
         api_params = {
             "model": self.model,
-            "messages": messages
+            "messages": messages,
+            # routes requests with the same prefix to the same cache
+            "prompt_cache_key": f"{self.model}:{report_type}"
         }
 
         if is_new_gen:
@@ -94,22 +184,233 @@ class LLMAnalyzer:
         else:
             # Older models require temperature
             api_params["temperature"] = self.temperature
+
+        if self.max_completion_tokens:
+            api_params["max_completion_tokens"] = self.max_completion_tokens
+        return api_params
+
+    def _build_quick_request(self, ticker: str) -> Dict:
+        """
+        Builds the short sentiment-only request for quick_model.
+        """
+        prompt = self.quick_prompt.format(ticker=ticker, news=self._get_latest_news(ticker))
+        api_params = {
+            "model": self.quick_model,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        if self.quick_model.startswith("gpt-5") or "o1" in self.quick_model:
+            # reasoning tokens count against the completion limit, so only keep the effort low
+            api_params["reasoning_effort"] = "low"
+        else:
+            api_params["temperature"] = 0
+            api_params["max_completion_tokens"] = 8
+        return api_params
+
+    def _parse_quick_sentiment(self, content: Optional[str]) -> Optional[str]:
+        match = QUICK_SENTIMENT_PATTERN.search(content or "")
+        return match.group(1).upper() if match else None
+
+    @staticmethod
+    def _incomplete_report(ticker: str, content: Optional[str], finish_reason: Optional[str]) -> Optional[Dict[str, str]]:
+        """
+        Returns an error report if the completion was cut off (e.g. at max_completion_tokens) or came back empty, otherwise None.
+        Such answers are never parsed or cached, so a truncated report can't pass as NEUTRAL.
+        """
+        if finish_reason != "stop":
+            error = f"incomplete response (finish_reason: {finish_reason})"
+        elif not (content or "").strip():
+            error = "empty response"
+        else:
+            return None
+        logger.error(f"LLM Analysis failed for {ticker}: {error}")
+        return {"report": f"Error: {error}", "sentiment": "ERROR"}
+
+    def _parse_report(self, full_content: str) -> Dict[str, str]:
+        # Extract the sentiment using Regex
+        sentiment_match = SENTIMENT_PATTERN.search(full_content)
+        sentiment = sentiment_match.group(1).upper() if sentiment_match else "NEUTRAL"
+        
+        # Clean the sentiment tag from the displayed report to the user
+        clean_report = SENTIMENT_LINE_PATTERN.sub("", full_content).strip()
+        
+        return {
+            "report": clean_report,
+            "sentiment": sentiment
+        }
+
+    def get_equity_report(self, ticker: str, report_type: str = "fundamental") -> Dict[str, str]:
+        """
+        Creates a full analysis report based on the professional prompt you defined.
+        """
+        api_params = self._build_request(ticker, report_type)
+        if api_params is None:
+            return {"report": "Error: Prompt not found.", "sentiment": "ERROR"}
+        
+        cache_path = self._response_cache_path(api_params)
+        cached_report = self._get_cached_report(cache_path)
+        if cached_report is not None:
+            return cached_report
         
         try:
             response = self.client.chat.completions.create(**api_params)
             full_content = response.choices[0].message.content
-            
-            # Extract the sentiment using Regex
-            sentiment_match = re.search(r"FINAL_SENTIMENT:\s*(BULLISH|BEARISH|NEUTRAL)", full_content, re.IGNORECASE)
-            sentiment = sentiment_match.group(1).upper() if sentiment_match else "NEUTRAL"
-            
-            # Clean the sentiment tag from the displayed report to the user
-            clean_report = re.sub(r"FINAL_SENTIMENT:.*", "", full_content).strip()
-            
-            return {
-                "report": clean_report,
-                "sentiment": sentiment
-            }
+            finish_reason = response.choices[0].finish_reason
         except Exception as e:
             logger.error(f"LLM Analysis failed for {ticker}: {e}")
-            return {"report": f"Error: {e}", "sentiment": "ERROR"}
\ No newline at end of file
+            return {"report": f"Error: {e}", "sentiment": "ERROR"}
+
+        error_report = self._incomplete_report(ticker, full_content, finish_reason)
+        if error_report is not None:
+            return error_report
+
+        report = self._parse_report(full_content)
+        self._write_cache(cache_path, report)
+        return report
+
+    async def _get_equity_report_async(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                                       ticker: str, report_type: str) -> Dict[str, str]:
+        async with semaphore:
+            # the news search is a blocking call, keep it off the event loop
+            api_params = await asyncio.to_thread(self._build_request, ticker, report_type)
+            if api_params is None:
+                return {"report": "Error: Prompt not found.", "sentiment": "ERROR"}
+
+            cache_path = self._response_cache_path(api_params)
+            cached_report = self._get_cached_report(cache_path)
+            if cached_report is not None:
+                return cached_report
+
+            if self.quick_model:
+                try:
+                    quick_params = await asyncio.to_thread(self._build_quick_request, ticker)
+                    response = await client.chat.completions.create(**quick_params)
+                    if self._parse_quick_sentiment(response.choices[0].message.content) == "NEUTRAL":
+                        # no report was generated, so the entry carries no report text that could be mistaken for one
+                        return {"skipped": True, "quick_sentiment": "NEUTRAL"}
+                except Exception as e:
+                    # a failed screen is not a reason to skip the ticker
+                    logger.warning(f"Quick screen failed for {ticker}, generating the full report: {e}")
+
+            try:
+                response = await client.chat.completions.create(**api_params)
+            except Exception as e:
+                logger.error(f"LLM Analysis failed for {ticker}: {e}")
+                return {"report": f"Error: {e}", "sentiment": "ERROR"}
+
+            choice = response.choices[0]
+            error_report = self._incomplete_report(ticker, choice.message.content, choice.finish_reason)
+            if error_report is not None:
+                return error_report
+
+            report = self._parse_report(choice.message.content)
+            self._write_cache(cache_path, report)
+            return report
+
+    async def _get_equity_reports_async(self, tickers: List[str], report_type: str) -> List[Dict[str, str]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as client:
+            return await asyncio.gather(*[
+                self._get_equity_report_async(client, semaphore, ticker, report_type)
+                for ticker in tickers
+            ])
+
+    def get_equity_reports(self, tickers: List[str], report_type: str = "fundamental") -> Dict[str, Dict[str, str]]:
+        """
+        Creates reports for several tickers concurrently (at most max_concurrency requests in flight).
+        If quick_model is set, tickers it rates NEUTRAL are not analyzed: their entry is {"skipped": True, "quick_sentiment": "NEUTRAL"}
+        without report or sentiment, and must not be stored as a report.
+        With use_batch_api the reports are submitted as one batch (without the quick screen) and this call waits for it to finish.
+        Returns a dict of ticker -> report, in the same format as get_equity_report (apart from the skipped entries).
+        """
+        if self.use_batch_api:
+            batch_id = self.submit_batch(tickers, report_type)
+            deadline = time.monotonic() + self.batch_max_wait_minutes * 60
+            while True:
+                reports = self.get_batch_results(batch_id)
+                if reports is not None:
+                    return reports
+                if time.monotonic() >= deadline:
+                    # the batch keeps running on the API side; its results can still be collected with get_batch_results
+                    logger.error(f"Batch {batch_id} did not finish within {self.batch_max_wait_minutes} minutes")
+                    return {
+                        ticker: {"report": f"Error: batch {batch_id} did not finish in time", "sentiment": "ERROR"}
+                        for ticker in tickers
+                    }
+                time.sleep(self.batch_poll_seconds)
+
+        reports = asyncio.run(self._get_equity_reports_async(tickers, report_type))
+        return dict(zip(tickers, reports))
+
+    def submit_batch(self, tickers: List[str], report_type: str = "fundamental") -> str:
+        """
+        Submits the reports for all tickers as a single Batch API job and returns the batch id.
+        """
+        lines = []
+        for ticker in dict.fromkeys(tickers):  # custom_id has to be unique within the batch
+            api_params = self._build_request(ticker, report_type)
+            if api_params is None:
+                raise ValueError(f"No prompt configured for report type '{report_type}'")
+            lines.append(json.dumps({
+                "custom_id": ticker,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": api_params
+            }))
+
+        batch_file = self.client.files.create(
+            file=(f"{report_type}_reports.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(lines)} {report_type} reports")
+        return batch.id
+
+    def get_batch_results(self, batch_id: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        Returns ticker -> report for a finished batch, or None while the batch is still running.
+        Tickers whose request failed get an error report.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+            return None
+        if batch.status != "completed":
+            logger.error(f"Batch {batch_id} ended with status {batch.status}")
+
+        # expired and cancelled batches can still carry the results of the requests that did finish
+        reports = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                ticker = item["custom_id"]
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    error = item.get("error") or response.get("body", {}).get("error")
+                    logger.error(f"LLM Analysis failed for {ticker}: {error}")
+                    reports[ticker] = {"report": f"Error: {error}", "sentiment": "ERROR"}
+                else:
+                    choice = response["body"]["choices"][0]
+                    content = choice["message"].get("content")
+                    reports[ticker] = (
+                        self._incomplete_report(ticker, content, choice.get("finish_reason"))
+                        or self._parse_report(content)
+                    )
+
+        # every submitted ticker gets an entry, also when the batch failed as a whole;
+        # a completed batch only needs its input file read back when some results are missing
+        counts = batch.request_counts
+        if batch.status != "completed" or counts is None or len(reports) < counts.total:
+            for line in self.client.files.content(batch.input_file_id).text.splitlines():
+                if line.strip():
+                    reports.setdefault(
+                        json.loads(line)["custom_id"],
+                        {"report": f"Error: batch {batch.status}", "sentiment": "ERROR"}
+                    )
+        return reports
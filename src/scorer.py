@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics import r2_score
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +13,12 @@ class ScoringEngine:
             'breakout_strength': 0.1,
             'freshness': 0.1
         })
+        # resolved once instead of five dict lookups per score
+        self._quality_weight = self.weights.get('quality', 0.2)
+        self._compression_weight = self.weights.get('compression', 0.3)
+        self._volume_weight = self.weights.get('volume', 0.3)
+        self._strength_weight = self.weights.get('breakout_strength', 0.1)
+        self._freshness_weight = self.weights.get('freshness', 0.1)
         self.r2_quality_min = config.get('r2_quality_min', 0.5)
         self.breakout_strength_max = config.get('breakout_strength_max', 0.03)
         self.volume_window = config.get('volume_window', 20)
@@ -25,6 +30,7 @@ class ScoringEngine:
         self.final_score_scale = config.get('final_score_scale', 100.0)
         self.volatility_bonus_scale = config.get('volatility_bonus_scale', 10.0)
         self.annual_trading_days = config.get('annual_trading_days', 252)
+        self._annualization_factor = self.annual_trading_days ** 0.5
         self.max_annual_volatility = config.get('max_annual_volatility', 0.50)
 
     def _normalize_age_scores(self, scores) -> dict:
@@ -46,9 +52,14 @@ class ScoringEngine:
                 return 0.0
             
             # If there is no breakout upwards, we can give a very low score or 0
+            # (everything below can rely on is_breaking_out being set)
             if not pattern.get('is_breaking_out', False):
                 return 0.0
 
+            # plain arrays for the volume and volatility metrics, extracted once
+            close = df['Close'].to_numpy(dtype=np.float64)
+            volume = df['Volume'].to_numpy()
+
             # 1. Quality metric (R-squared) - how 'clean' the lines are
             # We check how close the extrema points are to the regression lines calculated in Detector
             quality_score = self._calculate_quality(pattern)
@@ -60,12 +71,12 @@ class ScoringEngine:
 
             # 3. Volume metric (Relative Volume)
             # A reliable breakout must come with volume higher than average
-            volume_score = self._calculate_volume_score(df)
+            volume_score = self._calculate_volume_score(volume)
 
             # 4. Breakout Strength (Normalization: breakout_strength_max gets a score of 1.0)
             raw_strength = pattern.get('breakout_strength', 0)
             strength_score = 0.0
-            if pattern['is_breaking_out'] and self.breakout_strength_max > 0:
+            if self.breakout_strength_max > 0:
                 strength_score = max(0, min(1, raw_strength / self.breakout_strength_max))
 
             # 5. Freshness Score (Bonus for the first day)
@@ -73,15 +84,15 @@ class ScoringEngine:
             freshness_score = self.breakout_age_scores.get(age, self.breakout_age_default_score)
 
             # 6. Momentum/Volatility Bonus
-            vol_score = self._calculate_volatility_score(df)
+            vol_score = self._calculate_volatility_score(close)
 
             # Final calculation
             final_score = (
-                quality_score * self.weights.get('quality', 0.2) +
-                compression_score * self.weights.get('compression', 0.3) +
-                volume_score * self.weights.get('volume', 0.3) +
-                strength_score * self.weights.get('breakout_strength', 0.1) +
-                freshness_score * self.weights.get('freshness', 0.1)
+                quality_score * self._quality_weight +
+                compression_score * self._compression_weight +
+                volume_score * self._volume_weight +
+                strength_score * self._strength_weight +
+                freshness_score * self._freshness_weight
             )
             final_score = (
                 (final_score * self.final_score_scale) +
@@ -110,12 +121,17 @@ class ScoringEngine:
         # Validation that the value is within the range [0, 1]
         return max(0, min(1, quality))
 
-    def _calculate_volume_score(self, df: pd.DataFrame) -> float:
+    def _calculate_volume_score(self, volume: np.ndarray) -> float:
         """
         Checks whether the current volume is higher than the average of the last 20 days.
+        Takes the raw volume array so no pandas work happens in here.
         """
-        recent_volume = df['Volume'].values[-1]
-        avg_volume = df['Volume'].rolling(window=self.volume_window).mean().values[-1]
+        if len(volume) < self.volume_window:
+            return 0.0
+
+        # only the latest average is needed, no need for the full rolling series
+        recent_volume = volume[-1]
+        avg_volume = volume[-self.volume_window:].mean()
         
         if avg_volume == 0: return 0
         
@@ -125,18 +141,21 @@ class ScoringEngine:
             return 0.0
         return float(max(0, min(1, (rel_vol / self.volume_ratio_full_score))))
 
-    def _calculate_volatility_score(self, df: pd.DataFrame) -> float:
+    def _calculate_volatility_score(self, close: np.ndarray) -> float:
         """
         Calculates annualized volatility to identify high-momentum stocks.
+        Takes the raw float64 close array so no pandas work happens in here.
         """
         # Calculate daily returns standard deviation
-        daily_returns = df['Close'].pct_change().dropna()
-        if daily_returns.empty:
+        if close.size < 2:
             return 0.0
+        daily_returns = np.diff(close)
+        daily_returns /= close[:-1]
             
         # Annual volatility formula:
         # $\sigma_{annual} = \sigma_{daily} \cdot \sqrt{252}$
-        annual_vol = daily_returns.std() * (self.annual_trading_days ** 0.5)
+        # ddof=1 keeps the sample std that pandas used before
+        annual_vol = daily_returns.std(ddof=1) * self._annualization_factor
 
         # Normalization: volatility of max_annual_volatility or higher gets a score of 1.0
         if self.max_annual_volatility <= 0:
@@ -1,69 +1,184 @@
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import lxml.html
 import logging
 import os
-from io import StringIO
-from datetime import datetime, timedelta
+import time
+import json
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# returned by a fetcher when the source answered 304, i.e. the cached list is still current
+NOT_MODIFIED = object()
+
 class TickerProvider:
     def __init__(self, cache_dir: str = ".cache", cache_expiry_days: int = 1):
         self.cache_dir = cache_dir
         self.cache_expiry_days = cache_expiry_days
+        self._cache_expiry_seconds = cache_expiry_days * 86400
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        # one pooled session for all sources, so a refresh doesn't redo the TCP/TLS handshake per request
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        ))
+        # ETag / Last-Modified of the latest responses, saved next to the cache once it is written
+        self._validators = {}
+        # (sources, sort) -> (cache file mtimes, merged tickers) for repeated calls in the same process
+        self._memo = {}
         
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
 
     def _get_cache_path(self, name: str) -> str:
-        return os.path.join(self.cache_dir, f"{name}_tickers.csv")
+        # a pickled list of symbols loads without going through pandas at all
+        return os.path.join(self.cache_dir, f"{name}_tickers.pkl")
+
+    @staticmethod
+    def _read_cache(path: str) -> list:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _get_meta_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}_meta.json")
+
+    def _conditional_get(self, name: str, url: str, timeout: int) -> requests.Response:
+        """
+        GET that revalidates an existing cache with If-None-Match / If-Modified-Since,
+        so an unchanged source costs a 304 instead of a full download.
+        """
+        headers = {}
+        if os.path.exists(self._get_cache_path(name)):
+            try:
+                with open(self._get_meta_path(name)) as f:
+                    meta = json.load(f)
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+            except (OSError, ValueError):
+                pass
+
+        resp = self.session.get(url, headers=headers, timeout=timeout)
+        self._validators[name] = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+        return resp
+
+    def _get_valid_cache_mtime(self, path: str) -> Optional[float]:
+        # a single stat and a float compare, no datetime objects
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        return mtime if time.time() - mtime < self._cache_expiry_seconds else None
 
     def _is_cache_valid(self, path: str) -> bool:
-        if not os.path.exists(path):
-            return False
-        file_age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(path))
-        return file_age < timedelta(days=self.cache_expiry_days)
+        return self._get_valid_cache_mtime(path) is not None
+
+    def _valid_cache_mtimes(self, names: list) -> Optional[tuple]:
+        """
+        Returns the mtimes of the named cache files, or None if any of them is missing or expired.
+        """
+        mtimes = []
+        for name in names:
+            mtime = self._get_valid_cache_mtime(self._get_cache_path(name))
+            if mtime is None:
+                return None
+            mtimes.append(mtime)
+        return tuple(mtimes)
+
+    @staticmethod
+    def _normalize_symbols(symbols: list) -> list:
+        # yahoo style symbols (BRK.B -> BRK-B); plain string ops are cheaper than chaining .str accessors
+        return [str(symbol).strip().replace(".", "-") for symbol in symbols if str(symbol).strip()]
+
+    @staticmethod
+    def _extract_table_column(html: bytes, header_names: tuple) -> Optional[list]:
+        """
+        Returns the cell texts of the first column whose header contains one of header_names,
+        searching the page's tables in order. Only that one column is read, no DataFrames are built.
+        """
+        doc = lxml.html.fromstring(html)
+        for table in doc.xpath('//table'):
+            rows = table.xpath('.//tr')
+            if not rows:
+                continue
+            headers = [cell.text_content().strip() for cell in rows[0].xpath('./th|./td')]
+            col = next((i for i, header in enumerate(headers) if any(name in header for name in header_names)), None)
+            if col is None:
+                continue
+            values = []
+            for row in rows[1:]:
+                # row headers (<th scope="row">) count as cells too, so the column index stays aligned
+                cells = row.xpath('./th|./td')
+                if len(cells) > col:
+                    values.append(cells[col].text_content())
+            return values
+        return None
 
     def get_all_tickers(self, include_nasdaq=True, include_sp500=True, include_dow=True) -> list:
         """
         unified function that fetches all the tickers without duplicates
         """
-        all_tickers = set()
-        
+        all_tickers = {}
+        sources = []
         if include_sp500:
-            sp500_tickers = self._fetch_with_cache("sp500", self._fetch_sp500)
-            if sp500_tickers:
-                all_tickers.update(sp500_tickers)
+            sources.append(("sp500", self._fetch_sp500))
         if include_dow:
-            dow_tickers = self._fetch_with_cache("dow", self._fetch_dow)
-            if dow_tickers:
-                all_tickers.update(dow_tickers)
+            sources.append(("dow", self._fetch_dow))
         if include_nasdaq:
-            nasdaq_tickers = self._fetch_with_cache("nasdaq", self._fetch_nasdaq)
-            if nasdaq_tickers:
-                all_tickers.update(nasdaq_tickers)
+            sources.append(("nasdaq", self._fetch_nasdaq))
+        if not sources:
+            return []
+
+        # nothing to do if every source cache is still fresh and unchanged since the last merge
+        memo_key = tuple(name for name, _ in sources)
+        mtimes = self._valid_cache_mtimes([name for name, _ in sources])
+        memo = self._memo.get(memo_key)
+        if mtimes is not None and memo is not None and memo[0] == mtimes:
+            return list(memo[1])
+
+        # the sources are independent (separate sites and cache files), so the downloads can overlap
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [executor.submit(self._fetch_with_cache, name, fetch_func) for name, fetch_func in sources]
+            for future in futures:
+                tickers = future.result()
+                if tickers:
+                    all_tickers.update(dict.fromkeys(tickers))
             
         logger.info(f"Total unique tickers collected: {len(all_tickers)}")
-        return sorted(list(all_tickers))
+        result = sorted(all_tickers)
+
+        mtimes = self._valid_cache_mtimes([name for name, _ in sources])
+        if mtimes is not None:
+            self._memo[memo_key] = (mtimes, result)
+        return list(result)
 
     def _fetch_sp500(self):
         try:
             url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-            resp = requests.get(url, headers=self.headers, timeout=10)
+            resp = self._conditional_get("sp500", url, timeout=10)
+            if resp.status_code == 304:
+                return NOT_MODIFIED
             resp.raise_for_status()
 
-            tables = pd.read_html(StringIO(resp.text))
-            if not tables:
-                raise ValueError("No tables found on Wikipedia S&P 500 page.")
+            symbols = self._extract_table_column(resp.content, ("Symbol",))
+            if not symbols:
+                raise ValueError("No table with a 'Symbol' column found on Wikipedia S&P 500 page.")
 
-            df = tables[0]
-            if "Symbol" not in df.columns:
-                raise KeyError(f"Column 'Symbol' missing. Found: {df.columns.tolist()}")
-
-            return df["Symbol"].str.replace(".", "-", regex=False).tolist()
+            return self._normalize_symbols(symbols)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Network error fetching S&P 500: {e}")
@@ -75,17 +190,15 @@ class TickerProvider:
     def _fetch_dow(self):
         try:
             url = "https://en.wikipedia.org/wiki/Dow_Jones_Industrial_Average"
-            resp = requests.get(url, headers=self.headers, timeout=10)
+            resp = self._conditional_get("dow", url, timeout=10)
+            if resp.status_code == 304:
+                return NOT_MODIFIED
             resp.raise_for_status()
 
-            tables = pd.read_html(StringIO(resp.text))
-
             # search for a table that contains symbols - more resilient to changes in table position
-            for i, tbl in enumerate(tables):
-                cols = [str(c) for c in tbl.columns]
-                symbol_col = next((c for c in cols if "Symbol" in c or "Ticker" in c), None)
-                if symbol_col:
-                    return tbl[symbol_col].astype(str).str.strip().str.replace(".", "-", regex=False).tolist()
+            symbols = self._extract_table_column(resp.content, ("Symbol", "Ticker"))
+            if symbols:
+                return self._normalize_symbols(symbols)
             
             raise ValueError("Could not identify Dow Jones components table.")
         
@@ -96,23 +209,40 @@ class TickerProvider:
     def _fetch_nasdaq(self):
         try:
             url = "https://www.nasdaqtrader.com/dynamic/symdir/nasdaqlisted.txt"
-            resp = requests.get(url, headers=self.headers, timeout=15)
+            resp = self._conditional_get("nasdaq", url, timeout=15)
+            if resp.status_code == 304:
+                return NOT_MODIFIED
             resp.raise_for_status()
 
-            df = pd.read_csv(StringIO(resp.text), sep="|", on_bad_lines='skip')
-
-            if "Symbol" not in df.columns:
+            # only the columns used below are parsed, as strings; the header line tells which of them the file has
+            header = resp.content.split(b"\n", 1)[0].decode("utf-8", "replace").rstrip("\r").split("|")
+            if "Symbol" not in header:
                 logger.error("Nasdaq file format changed - 'Symbol' column not found.")
                 return []
+            columns = [name for name in ("Symbol", "Test Issue") if name in header]
+
+            # arrow's parser reads the raw bytes directly, no decoded copy of the body and no pandas frame
+            table = pacsv.read_csv(
+                BytesIO(resp.content),
+                parse_options=pacsv.ParseOptions(delimiter="|", invalid_row_handler=lambda row: "skip"),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=columns,
+                    column_types={name: pa.string() for name in columns}
+                )
+            )
             
-            # clean data: remove the footer row of Nasdaq
-            df = df[df["Symbol"].notna()]
-            df = df[~df["Symbol"].str.contains("File Creation Time", na=False)]
+            # clean data: remove the footer row of Nasdaq (a plain prefix test, the footer line starts with it)
+            symbols = table.column("Symbol")
+            keep = pc.invert(pc.starts_with(symbols, "File Creation Time"))
             
-            if "Test Issue" in df.columns:
-                df = df[df["Test Issue"] == "N"]
+            if "Test Issue" in table.column_names:
+                keep = pc.and_(keep, pc.equal(table.column("Test Issue"), "N"))
 
-            return df["Symbol"].astype(str).str.strip().str.replace(".", "-", regex=False).unique().tolist()
+            # missing symbols give a null mask entry, which filter drops
+            symbols = symbols.filter(keep).to_pylist()
+
+            # dict.fromkeys drops duplicates and keeps the file order
+            return list(dict.fromkeys(self._normalize_symbols(symbols)))
 
         except Exception as e:
             logger.error(f"Error fetching Nasdaq tickers: {e}")
@@ -127,7 +257,7 @@ class TickerProvider:
         # 1. try to load from cache if it's valid
         if self._is_cache_valid(cache_path):
             try:
-                cached_data = pd.read_csv(cache_path)['Symbol'].tolist()
+                cached_data = self._read_cache(cache_path)
                 if cached_data:
                     logger.info(f"Loaded {len(cached_data)} {name} tickers from cache.")
                     return cached_data
@@ -136,10 +266,31 @@ class TickerProvider:
 
         # 2. try to fetch from source
         tickers = fetch_func()
+
+        if tickers is NOT_MODIFIED:
+            try:
+                cached_data = self._read_cache(cache_path)
+                # the list is unchanged, so restart its TTL
+                os.utime(cache_path)
+                logger.info(f"{name} tickers not modified at source, keeping {len(cached_data)} cached tickers.")
+                return cached_data
+            except Exception as e:
+                # the cache can't be used, so drop the validators and download the full list
+                logger.warning(f"Failed to read cache for {name}: {e}")
+                try:
+                    os.remove(self._get_meta_path(name))
+                except OSError:
+                    pass
+                tickers = fetch_func()
         
-        if tickers:
+        if tickers and tickers is not NOT_MODIFIED:
             try:
-                pd.DataFrame({'Symbol': tickers}).to_csv(cache_path, index=False)
+                with open(cache_path, 'wb') as f:
+                    pickle.dump(list(tickers), f, protocol=pickle.HIGHEST_PROTOCOL)
+                validators = self._validators.pop(name, None)
+                if validators and any(validators.values()):
+                    with open(self._get_meta_path(name), 'w') as f:
+                        json.dump(validators, f)
                 logger.info(f"Successfully cached {len(tickers)} {name} tickers.")
                 return tickers
             except Exception as e:
@@ -149,6 +300,6 @@ class TickerProvider:
         # 3. fallback: if everything fails, try to load expired cache
         if os.path.exists(cache_path):
             logger.warning(f"Source failed for {name}. Falling back to expired cache.")
-            return pd.read_csv(cache_path)['Symbol'].tolist()
+            return self._read_cache(cache_path)
             
         return []
\ No newline at end of file
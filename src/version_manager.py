@@ -16,6 +16,7 @@ class VersionManager:
             return {"version": "v0", "changelog": []}
 
     @staticmethod
+    @st.cache_data(ttl=3600, show_spinner=False)  # the sidebar is drawn on every rerun, don't hit the network each time
     def check_for_updates():
         info = VersionManager.get_local_info()
         current_version = info.get("version")
@@ -1,28 +1,37 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 import os
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# volume bar colors, indexed by "closed at or above the open"
+VOLUME_BAR_COLORS = np.array(['rgba(255, 50, 50, 0.6)', 'rgba(50, 255, 50, 0.6)'], dtype=object)
+
 class Visualizer:
     def __init__(self, config: dict):
         self.charts_output_dir = config.get('charts_output_dir', 'reports/charts')
         self.sma_period = config.get('sma_period', 150)
         self.show_plot = config.get('show_plot', False)
+        # 'cdn' references plotly.js instead of inlining the ~3.5MB bundle into every chart; True embeds it for offline use
+        self.include_plotlyjs = config.get('include_plotlyjs', 'cdn')
         # Create the output directory if it doesn't exist
         if not os.path.exists(self.charts_output_dir):
             os.makedirs(self.charts_output_dir)
+        # subplot grid and static layout are the same for every chart, so build them once and copy per ticker
+        self._base_figure = self._build_base_figure()
+        # HTML serialization and the file write run in the background; flush() waits for them
+        self.write_workers = config.get('write_workers', 4)
+        self._write_executor = None
+        self._pending_writes = []
 
-    def create_chart(self, ticker: str, df: pd.DataFrame, pattern: dict, score: float):
-        """
-        Creates an interactive chart with candlestick, trend lines, and volume, and saves it as an HTML file.
-        """
-        logger.info(f"Generating chart for {ticker}...")
-        
-        # 1. Creating subplots with secondary y-axis for volume
+    def _build_base_figure(self) -> go.Figure:
+        # Creating subplots with secondary y-axis for volume
         fig = make_subplots(
             rows=2, cols=1,
             shared_xaxes=True,
@@ -30,15 +39,76 @@ class Visualizer:
             row_heights=[0.7, 0.3],
             subplot_titles=('Price', 'Volume')
         )
+
+        fig.update_layout(
+            template='plotly_dark',  # Dark theme that suits trading
+            height=800,
+            hovermode="x unified",  # Simplifies data reading
+            showlegend=True
+        )
+
+        # Update y-axes labels
+        fig.update_yaxes(title_text="Price (USD)", row=1, col=1)
+        fig.update_yaxes(title_text="Volume", row=2, col=1)
+        fig.update_xaxes(title_text="Date", row=2, col=1)
+
+        # Remove the range slider
+        fig.update_layout(xaxis_rangeslider_visible=False)
+        return fig
+
+    def _chart_signature(self, ticker: str, df: pd.DataFrame, pattern: dict, score: float) -> str:
+        """
+        Short content hash of everything that goes into a chart.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"{ticker}|{score:.4f}|{self.sma_period}".encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        for key in sorted(pattern):
+            value = pattern[key]
+            if key == 'trendlines' and isinstance(value, dict):
+                for side in ('upper', 'lower'):
+                    line = value.get(side)
+                    digest.update(side.encode())
+                    if line is not None:
+                        digest.update(pd.util.hash_pandas_object(line, index=True).to_numpy().tobytes())
+            else:
+                digest.update(f"{key}={value!r}".encode())
+        return f"chart-{digest.hexdigest()}"
+
+    def create_chart(self, ticker: str, df: pd.DataFrame, pattern: dict, score: float):
+        """
+        Creates an interactive chart with candlestick, trend lines, and volume, and saves it as an HTML file.
+        If the same chart was already written today, the existing file is kept.
+        """
+        today_str = datetime.now().strftime('%Y-%m-%d')
+        filename = f"{ticker}_{today_str}_score_{int(score)}.html"
+        file_path = os.path.join(self.charts_output_dir, filename)
+
+        # the signature is written into the file's first line, so an unchanged rerun can be detected from the file itself
+        signature = self._chart_signature(ticker, df, pattern, score)
+        if not self.show_plot and self._chart_is_current(file_path, signature):
+            logger.info(f"Chart for {ticker} is up to date: {file_path}")
+            return
+
+        logger.info(f"Generating chart for {ticker}...")
+        
+        # 1. Starting from a copy of the prepared subplot layout
+        fig = go.Figure(self._base_figure)
+
+        # plain arrays for the price columns, reused by the traces, the volume colors and the annotations
+        open_prices = df['Open'].to_numpy()
+        high_prices = df['High'].to_numpy()
+        low_prices = df['Low'].to_numpy()
+        close_prices = df['Close'].to_numpy()
         
         # 2. Adding the candlestick chart to the first subplot
         fig.add_trace(
             go.Candlestick(
                 x=df.index,
-                open=df['Open'],
-                high=df['High'],
-                low=df['Low'],
-                close=df['Close'],
+                open=open_prices,
+                high=high_prices,
+                low=low_prices,
+                close=close_prices,
                 name=f'{ticker} Price'
             ),
             row=1, col=1
@@ -94,8 +164,8 @@ class Visualizer:
         # 5. Adding volume bars to the second subplot (if Volume column exists)
         # Color volume bars: green for up days, red for down days
         if 'Volume' in df.columns:
-            colors = ['rgba(50, 255, 50, 0.6)' if close >= open else 'rgba(255, 50, 50, 0.6)' 
-                      for close, open in zip(df['Close'], df['Open'])]
+            up_days = close_prices >= open_prices
+            colors = VOLUME_BAR_COLORS[up_days.astype(np.intp)].tolist()
             
             fig.add_trace(
                 go.Bar(
@@ -113,7 +183,7 @@ class Visualizer:
         # 6. Adding an indication of the breakout (if it happened)
         if pattern.get('is_breaking_down', False):
             fig.add_annotation(
-                x=df.index[-1], y=df['Low'].iloc[-1],
+                x=df.index[-1], y=low_prices[-1],
                 text="⚠️ BEARISH BREAKDOWN",
                 showarrow=True, arrowhead=1, arrowcolor="red",
                 bgcolor="white", font=dict(color="red"),
@@ -122,7 +192,7 @@ class Visualizer:
 
         if pattern.get('is_breaking_out', False):
              fig.add_annotation(
-                 x=df.index[-1], y=df['High'].iloc[-1],
+                 x=df.index[-1], y=high_prices[-1],
                  text="🚀 BULLISH BREAKOUT",
                  showarrow=True, arrowhead=1, arrowcolor="gold",
                  bgcolor="black", font=dict(color="gold"),
@@ -130,7 +200,6 @@ class Visualizer:
              )
 
         # 7. Designing the title and general layout
-        today_str = datetime.now().strftime('%Y-%m-%d')
         # Building the title with all the important information
         title_text = (
             f"<b>{ticker}</b> Analysis Report | Date: {today_str}<br>"
@@ -139,29 +208,55 @@ class Visualizer:
             f"R² High: {pattern.get('r2_high', 0):.2f}"
         )
 
-        fig.update_layout(
-            title=title_text,
-            template='plotly_dark',  # Dark theme that suits trading
-            height=800,
-            hovermode="x unified",  # Simplifies data reading
-            showlegend=True
-        )
-        
-        # Update y-axes labels
-        fig.update_yaxes(title_text="Price (USD)", row=1, col=1)
-        fig.update_yaxes(title_text="Volume", row=2, col=1)
-        fig.update_xaxes(title_text="Date", row=2, col=1)
-        
-        # Remove the range slider
-        fig.update_layout(xaxis_rangeslider_visible=False)
+        # the rest of the layout comes from the base figure
+        fig.update_layout(title=title_text)
 
-        # 8. Saving to an HTML file
-        filename = f"{ticker}_{today_str}_score_{int(score)}.html"
-        file_path = os.path.join(self.charts_output_dir, filename)
-        fig.write_html(file_path)
-        
-        logger.info(f"Chart saved successfully to: {file_path}")
+        # 8. Saving to an HTML file (in the background, so the next chart can be built meanwhile)
+        if self._write_executor is None:
+            self._write_executor = ThreadPoolExecutor(max_workers=self.write_workers)
+        self._pending_writes.append(self._write_executor.submit(self._write_chart, fig, file_path, signature))
 
         # Optional: opening the chart in the browser immediately
         if self.show_plot:
-            fig.show()
\ No newline at end of file
+            fig.show()
+
+    def _write_chart(self, fig: go.Figure, file_path: str, signature: str):
+        html = fig.to_html(
+            div_id=signature,
+            include_plotlyjs=self.include_plotlyjs,
+            include_mathjax=False,
+            full_html=True,
+            config={'displaylogo': False, 'responsive': True},
+            auto_play=False,
+            validate=False  # the figure was built from graph objects, already validated
+        )
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self._signature_line(signature))
+            f.write(html)
+        
+        logger.info(f"Chart saved successfully to: {file_path}")
+
+    def flush(self):
+        """
+        Waits until every chart passed to create_chart so far has been written.
+        """
+        pending, self._pending_writes = self._pending_writes, []
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Failed to write chart: {e}")
+
+    @staticmethod
+    def _signature_line(signature: str) -> str:
+        return f"<!-- {signature} -->\n"
+
+    @classmethod
+    def _chart_is_current(cls, file_path: str, signature: str) -> bool:
+        # only the first line is read, however large the chart (e.g. with plotly.js embedded)
+        expected = cls._signature_line(signature)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.readline(len(expected)) == expected
+        except (OSError, UnicodeDecodeError):
+            return False
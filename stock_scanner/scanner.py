@@ -1,10 +1,12 @@
 import logging
+import os
 import yaml
 import pandas as pd
+import numpy as np
 import sys
 from pathlib import Path
 from typing import List, Dict, Any
-from concurrent.futures import ProcessPoolExecutor, as_completed # for performance
+from concurrent.futures import ProcessPoolExecutor # for performance
 
 # Add the parent directory to the Python path so we can import from src
 parent_dir = Path(__file__).parent.parent
@@ -31,12 +33,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger("StockScanner")
 
+# engines of the current worker process, set once by _init_worker
+_worker_engines = None
+
+def _init_worker(data_engine, detector, scorer):
+    """
+    Pool initializer: the engines are pickled once per worker instead of once per submitted ticker.
+    """
+    global _worker_engines
+    _worker_engines = (data_engine, detector, scorer)
+
 # External helper function for parallel processing
-def analyze_single_ticker(ticker: str, data_engine, detector, scorer):
+def analyze_single_ticker(ticker: str, data_engine=None, detector=None, scorer=None):
     """
     Runs the entire analysis for a single ticker. This function runs in a separate Process.
+    Engines that are not passed in come from the worker's _init_worker.
     """
     try:
+        if data_engine is None:
+            data_engine, detector, scorer = _worker_engines
         df = data_engine.fetch_historical_data(ticker)
         if df is None or df.empty:
             return None
@@ -82,6 +97,10 @@ class StockScanner:
         """
         logger.info(f"Starting scan for {len(ticker_list)} tickers...")
 
+        # step 0: bring the local price cache up to date in a few multi-ticker downloads,
+        # so the filter and the analysis workers read from disk instead of requesting one ticker at a time
+        self.data_engine.prefetch(ticker_list, batch_size=self.config.get('filters', {}).get('batch_size', 50))
+
         # step 1: fetch the fundamental data and primary filtering (Market Cap, etc.)
         # done in a vectorized or fast way
         raw_candidates = self.filter_engine.apply_coarse_filters(ticker_list)
@@ -91,26 +110,38 @@ class StockScanner:
         # step 2: graph analysis (the computationally heavy part)
         # here we use Parallel Processing in the ProcessPoolExecutor
         final_candidates = []
-        max_workers = self.config.get('performance', {}).get('max_workers', 8)
+        # no configured limit means one worker per core; never more workers than tickers to analyze
+        max_workers = self.config.get('performance', {}).get('max_workers') or os.cpu_count() or 1
+        max_workers = min(max_workers, total_candidates)
+
+        if max_workers == 0:
+            self._generate_outputs(final_candidates)
+            return
 
         logger.info(f"Spawning Pool with {max_workers} workers...")
+        # about a hundred progress lines per scan are enough for the logs page, which only reads the latest one
+        log_every = max(1, total_candidates // 100)
         
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Sending all the tasks to the Pool
-            futures = {
-                executor.submit(analyze_single_ticker, ticker, self.data_engine, self.detector, self.scorer): ticker 
-                for ticker in raw_candidates
-            }
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(self.data_engine, self.detector, self.scorer)
+        ) as executor:
+            # Sending all the tasks to the Pool - only the ticker travels with each task,
+            # and several tickers share one round-trip to a worker
+            chunksize = max(1, total_candidates // (max_workers * 4))
+            results = executor.map(analyze_single_ticker, raw_candidates, chunksize=chunksize)
             
-            for i, future in enumerate(as_completed(futures), 1): # progress bar
-                result = future.result()
-                logger.info(f"SCAN_PROGRESS: {i}/{total_candidates}")
+            for i, result in enumerate(results, 1): # progress bar
+                if i % log_every == 0 or i == total_candidates:
+                    logger.info(f"SCAN_PROGRESS: {i}/{total_candidates}")
                 if result:
                     final_candidates.append(result)
                     logger.info(f"✅ Found valid pattern for {result['ticker']} (Score: {result['score']:.2f})")
 
-        # Sorting by the weighted score (highest first)
-        final_candidates.sort(key=lambda x: x['score'], reverse=True)
+        # Sorting by the weighted score (highest first); the stable sort keeps ties in ticker order
+        scores = np.fromiter((c['score'] for c in final_candidates), dtype=np.float64, count=len(final_candidates))
+        final_candidates = [final_candidates[i] for i in np.argsort(-scores, kind='stable')]
 
         # step 4: output and visualization
         self._generate_outputs(final_candidates)
@@ -131,6 +162,7 @@ class StockScanner:
                 candidate['pattern'],
                 candidate['score']
             )
+        self.visualizer.flush()
 
 if __name__ == "__main__":
     # initialize the scanner
@@ -7,28 +7,36 @@ Uses analyze_single_ticker and create_chart to visualize the results.
 import logging
 import yaml
 import sys
+import os
+import glob
+import pickle
 import argparse
 from pathlib import Path
 
-# Add the parent directory to the Python path so we can import from src
-parent_dir = Path(__file__).parent.parent
-if str(parent_dir) not in sys.path:
-    sys.path.insert(0, str(parent_dir))
-
-from src.data_loader import DataEngine
-from src.detector import PatternDetector
-from src.scorer import ScoringEngine
-from src.visualizer import Visualizer
-from stock_scanner.scanner import analyze_single_ticker
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+# libyaml-backed loader when PyYAML was built with it, the pure-Python one otherwise
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Add the parent directory to the Python path so we can import from src.
+# Only needed when run as a plain script; under `python -m stock_scanner.test_single_ticker` or an import it's already there.
+if __name__ == "__main__" and not __package__:
+    parent_dir = str(Path(__file__).resolve().parent.parent)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+# Setup logging: pre-built handlers on the root logger, installed before stock_scanner.scanner is imported
+# (which makes its basicConfig a no-op). Like a scan, a test run also goes to scanner.log; that file keeps
+# full timestamps because the Scanner Logs page reads the date from them, the console only needs the time of day.
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_file_handler = logging.FileHandler("scanner.log")
+_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt='%H:%M:%S'))
+logging.root.addHandler(_file_handler)
+logging.root.addHandler(_console_handler)
+logging.root.setLevel(logging.INFO)
 logger = logging.getLogger("TickerTester")
 
 # Define the ticker to analyze here
@@ -36,14 +44,37 @@ TICKER = "BLK"  # Change this to test different tickers
 
 
 def load_config(config_path: str = "config/settings.yaml"):
-    """Load configuration from YAML file."""
+    """
+    Load configuration from YAML file.
+    The parsed dict is pickled next to the file, keyed by its mtime and size, so repeated runs skip the YAML parse.
+    """
     try:
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+        st = os.stat(config_path)
     except FileNotFoundError:
         logger.error(f"Config file not found at {config_path}")
         sys.exit(1)
 
+    cache_path = f"{config_path}.{st.st_mtime_ns}.{st.st_size}.pkl"
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass
+
+    with open(config_path, 'r') as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+
+    try:
+        # the file changed since the last run: drop the old snapshots so they don't pile up
+        for stale in glob.glob(f"{glob.escape(config_path)}.*.pkl"):
+            os.remove(stale)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(config, f, protocol=5)
+    except OSError as e:
+        logger.debug(f"Could not cache parsed config: {e}")
+
+    return config
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -61,9 +92,21 @@ def main():
         default="config/settings.yaml",
         help="Path to configuration file (default: config/settings.yaml)"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the analysis with cProfile and write the stats to profile_<TICKER>.prof"
+    )
     
     args = parser.parse_args()
     ticker = args.ticker.upper()
+
+    # imported here rather than at module level so --help and argument errors don't pay for pandas/plotly/yfinance
+    from src.data_loader import DataEngine
+    from src.detector import PatternDetector
+    from src.scorer import ScoringEngine
+    from src.visualizer import Visualizer
+    from stock_scanner.scanner import analyze_single_ticker
     
     logger.info(f"Testing pattern detection and scoring for {ticker}")
     
@@ -75,11 +118,20 @@ def main():
     data_engine = DataEngine(config.get('data', {}))
     detector = PatternDetector(config.get('patterns', {}))
     scorer = ScoringEngine(config.get('scoring', {}))
-    visualizer = Visualizer(config.get('visualization', {}))
-    
+
     # Analyze the ticker
     logger.info(f"Analyzing {ticker}...")
-    result = analyze_single_ticker(ticker, data_engine, detector, scorer)
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        result = analyze_single_ticker(ticker, data_engine, detector, scorer)
+        profiler.disable()
+        profile_path = f"profile_{ticker}.prof"
+        profiler.dump_stats(profile_path)
+        logger.info("Profile written to %s", profile_path)
+    else:
+        result = analyze_single_ticker(ticker, data_engine, detector, scorer)
     
     if result is None:
         logger.warning(f"No valid pattern found for {ticker}. This could mean:")
@@ -90,21 +142,24 @@ def main():
         return
     
     # Display results
-    logger.info(f"✅ Pattern detected for {ticker}!")
-    logger.info(f"   Score: {result['score']:.2f}/100")
-    logger.info(f"   Compression: {result['pattern'].get('compression', 0):.2f}")
-    logger.info(f"   R² High: {result['pattern'].get('r2_high', 0):.2f}")
-    logger.info(f"   Is Breaking Out: {result['pattern'].get('is_breaking_out', False)}")
-    logger.info(f"   Breakout Age: {result['pattern'].get('breakout_age', 'N/A')} days")
+    logger.info("✅ Pattern detected for %s!", ticker)
+    pattern = result['pattern']
+    logger.info("   Score: %.2f/100", result['score'])
+    logger.info("   Compression: %.2f", pattern.get('compression', 0))
+    logger.info("   R² High: %.2f", pattern.get('r2_high', 0))
+    logger.info("   Is Breaking Out: %s", pattern.get('is_breaking_out', False))
+    logger.info("   Breakout Age: %s days", pattern.get('breakout_age', 'N/A'))
     
-    # Create chart
+    # Create chart; the visualizer is only built once there is something to draw
+    visualizer = Visualizer(config.get('visualization', {}))
     logger.info(f"Generating chart for {ticker}...")
     visualizer.create_chart(
         result['ticker'],
         result['data'],
-        result['pattern'],
+        pattern,
         result['score']
     )
+    visualizer.flush()
     
     logger.info(f"Analysis complete! Chart saved to {visualizer.charts_output_dir}")
 
@@ -0,0 +1,74 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Add the parent directory to the Python path so we can import from src
+parent_dir = str(Path(__file__).resolve().parent.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from src.detector import PatternDetector, SELECTION_SCORE_TOLERANCE
+
+CONFIG_PATH = Path(parent_dir) / "config" / "settings.yaml"
+
+
+def _triangle_breakout_frame() -> pd.DataFrame:
+    """
+    Fixed random walk that ends in a converging triangle with an upside breakout.
+    Its 300- and 310-day windows find the same extrema, so their selection scores only differ by rounding.
+    """
+    rng = np.random.default_rng(13)
+    n = int(rng.integers(30, 400))
+    w = int(rng.integers(40, min(n, 340)))
+    base_price = 100 + rng.normal(0, 1) * 10
+    close = base_price + np.cumsum(rng.normal(0, 1, n))
+    start = n - w
+    t = np.arange(w)
+    amplitude = (1 - t / (w * rng.uniform(1.0, 1.3))) * rng.uniform(5, 15)
+    oscillation = amplitude * np.sin(t * 2 * np.pi / rng.uniform(8, 25))
+    close[start:] = close[start] + oscillation + rng.normal(0, 0.3, w)
+    k = rng.integers(1, 4)
+    close[-k:] += np.linspace(1, 2, k) * amplitude[-1] * rng.uniform(0.5, 3)
+    close = np.abs(close) + 5
+
+    high = close + np.abs(rng.normal(0, 1, n))
+    low = close - np.abs(rng.normal(0, 1, n))
+    index = pd.date_range("2023-01-01", periods=n, freq="B")
+    return pd.DataFrame(
+        {"Open": close, "High": high, "Low": low, "Close": close, "Volume": rng.integers(1e5, 1e6, n).astype(float)},
+        index=index
+    )
+
+
+class WindowSelectionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(CONFIG_PATH, "r") as f:
+            cls.config = yaml.safe_load(f)["patterns"]
+        cls.df = _triangle_breakout_frame()
+
+    def _single_window_score(self, window: int) -> float:
+        config = dict(self.config, adaptive_windows={"start": window, "end": window + 1, "step": 10})
+        return PatternDetector(config).analyze_convergence(self.df)["selection_score"]
+
+    def test_selected_window_is_pinned(self):
+        result = PatternDetector(self.config).analyze_convergence(self.df)
+        self.assertTrue(result["is_breaking_out"])
+        self.assertEqual(result["used_window"], 300)
+        self.assertAlmostEqual(result["selection_score"], 1.3102911372102477, places=12)
+
+    def test_tie_goes_to_the_earlier_window(self):
+        # the two windows tie within the tolerance; the 310-day one happens to round a few ulps higher
+        score_300, score_310 = self._single_window_score(300), self._single_window_score(310)
+        self.assertLess(abs(score_300 - score_310), SELECTION_SCORE_TOLERANCE)
+
+        config = dict(self.config, adaptive_windows={"start": 300, "end": 311, "step": 10})
+        self.assertEqual(PatternDetector(config).analyze_convergence(self.df)["used_window"], 300)
+
+
+if __name__ == "__main__":
+    unittest.main()